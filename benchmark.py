@@ -0,0 +1,276 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+
+# Headless Qt and a silent SDL mixer; must be set before main.py imports PyQt5 and pygame.
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+DEFAULT_SIZES = [1000, 10000, 200000]
+FIXTURE_SECONDS = 0.5
+FIXTURE_SAMPLE_RATE = 22050
+SUBFOLDERS = 10
+FILES_PER_SUBFOLDER = 10
+NEXT_TRACK_STEPS = 20
+SEEK_STEPS = 20
+
+
+def write_wav_fixture(path):
+    frames = int(FIXTURE_SECONDS * FIXTURE_SAMPLE_RATE)
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(FIXTURE_SAMPLE_RATE)
+        # A square wave compresses well and is cheap to produce without numpy.
+        f.writeframes(b"".join(struct.pack('<h', 8000 if (i // 50) % 2 else -8000) for i in range(frames)))
+
+
+def write_ogg_fixture(wav_path, ogg_path):
+    if shutil.which("ffmpeg"):
+        command = ["ffmpeg", "-loglevel", "error", "-y", "-i", wav_path, "-c:a", "libvorbis", ogg_path]
+    elif shutil.which("oggenc"):
+        command = ["oggenc", "--quiet", "-o", ogg_path, wav_path]
+    else:
+        return False
+    return subprocess.run(command).returncode == 0 and os.path.exists(ogg_path)
+
+
+def link_or_copy(source, destination):
+    # Hard links keep a 200k file library cheap to create; fall back to copies across filesystems.
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+
+
+def generate_library(root, size, templates):
+    os.makedirs(root)
+    for folder in range(SUBFOLDERS):
+        folder_path = os.path.join(root, f"artist_{folder:02d}")
+        os.mkdir(folder_path)
+        for i in range(FILES_PER_SUBFOLDER):
+            template = templates[i % len(templates)]
+            link_or_copy(template, os.path.join(folder_path, f"track_{i:03d}{os.path.splitext(template)[1]}"))
+    for i in range(size):
+        template = templates[i % len(templates)]
+        link_or_copy(template, os.path.join(root, f"track_{i:06d}{os.path.splitext(template)[1]}"))
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere.
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+def summarize(samples):
+    samples_ms = [sample * 1000 for sample in samples]
+    return {
+        'median_ms': statistics.median(samples_ms),
+        'min_ms': min(samples_ms),
+        'max_ms': max(samples_ms),
+        'runs': len(samples_ms),
+    }
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def benchmark_library(app, window, library_path, repeat):
+    results = {}
+
+    def open_folder(cold):
+        if cold:
+            window.directory_cache.clear()
+        window.folder_path_field.setText(library_path)
+        elapsed = timed(window.load_files)
+        app.processEvents()
+        return elapsed
+
+    results['folder_open_cold'] = summarize([open_folder(cold=True) for _ in range(repeat)])
+    results['folder_open_warm'] = summarize([open_folder(cold=False) for _ in range(repeat)])
+
+    item_count = window.file_browser.topLevelItemCount()
+    last_item = window.file_browser.topLevelItem(item_count - 1)
+    window.active_audio_name_label.setText(last_item.text(0))
+    results['active_index_lookup'] = summarize([timed(window.get_active_audio_index) for _ in range(repeat)])
+
+    middle_item = window.file_browser.topLevelItem(SUBFOLDERS + (item_count - SUBFOLDERS) // 2)
+    window.play_audio(window.get_file_browser_item_path(middle_item))
+    next_samples = []
+    for _ in range(NEXT_TRACK_STEPS):
+        next_samples.append(timed(window.play_next_audio_file))
+        app.processEvents()
+    results['next_track'] = summarize(next_samples)
+
+    # pygame can only seek in streams such as OGG, not in WAV.
+    seekable = [name for name in os.listdir(library_path) if name.endswith(".ogg")]
+    results['seek'] = None
+    if seekable:
+        window.play_audio(os.path.join(library_path, seekable[0]))
+        window.audio_length_label.setText(window.format_time(FIXTURE_SECONDS))
+        window.seek_slider.setMaximum(1)
+        seek_samples = []
+        for i in range(SEEK_STEPS):
+            seek_samples.append(timed(window.seek_slider_changed, i % 2))
+            app.processEvents()
+        results['seek'] = summarize(seek_samples)
+
+    results['shuffle'] = summarize([timed(window.shuffle_audio_files) for _ in range(repeat)])
+    results['peak_rss_mb'] = peak_rss_mb()
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_size(size, repeat, work_dir, templates, result_path):
+    # Runs in its own process so peak_rss_mb covers this library size only.
+    from PyQt5.QtWidgets import QApplication
+    import main
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    library_path = os.path.join(work_dir, f"library_{size}")
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        generation_start = time.perf_counter()
+        generate_library(library_path, size, templates)
+        generation_time = time.perf_counter() - generation_start
+        window = main.AudioPlayer()
+        results = benchmark_library(app, window, library_path, repeat)
+        window.close()
+    results['files'] = size
+    results['generation_s'] = generation_time
+    with open(result_path, 'w') as f:
+        json.dump(results, f)
+
+
+def run(sizes, repeat, work_dir):
+    fixtures_dir = os.path.join(work_dir, "fixtures")
+    os.makedirs(fixtures_dir)
+    wav_template = os.path.join(fixtures_dir, "template.wav")
+    write_wav_fixture(wav_template)
+    templates = [wav_template]
+    ogg_template = os.path.join(fixtures_dir, "template.ogg")
+    if write_ogg_fixture(wav_template, ogg_template):
+        templates.append(ogg_template)
+
+    # Keep ~/.musicapp (settings and playlists) of the benchmark away from the real one.
+    home = os.path.join(work_dir, "home")
+    os.makedirs(home)
+    environment = dict(os.environ, HOME=home, USERPROFILE=home)
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'fixture_formats': [os.path.splitext(template)[1] for template in templates],
+            'repeat': repeat,
+            # pygame cannot seek in WAV, so seek latency needs the OGG fixtures.
+            'seek_skipped': None if ogg_template in templates else "no OGG encoder (install ffmpeg or oggenc)",
+        },
+        'results': {},
+    }
+    for size in sorted(sizes):
+        result_path = os.path.join(work_dir, f"results_{size}.json")
+        command = [sys.executable, os.path.abspath(__file__), '--run-size', str(size), '--repeat', str(repeat),
+                   '--work-dir', work_dir, '--result-file', result_path, '--templates', *templates]
+        if subprocess.run(command, env=environment).returncode != 0:
+            raise RuntimeError(f"Benchmark for {size} files failed")
+        with open(result_path) as f:
+            report['results'][str(size)] = json.load(f)
+        print(f"{size} files done", file=sys.stderr)
+    return report
+
+
+def compare(baseline, current, threshold):
+    regressions = []
+    skipped = current.get('meta', {}).get('seek_skipped')
+    if skipped:
+        print(f"Seek latency not measured: {skipped}")
+    print(f"{'size':>8} {'metric':<22} {'baseline':>12} {'current':>12} {'change':>9}")
+    for size, results in current['results'].items():
+        baseline_results = baseline.get('results', {}).get(size)
+        if baseline_results is None:
+            continue
+        for metric, value in results.items():
+            old_value = baseline_results.get(metric)
+            if metric in ('files', 'generation_s'):
+                continue
+            if isinstance(value, dict):
+                value = value['median_ms']
+            if isinstance(old_value, dict):
+                old_value = old_value['median_ms']
+            if value is None and old_value:
+                print(f"{size:>8} {metric:<22} {old_value:>12.2f} {'missing':>12}")
+                continue
+            if value is None or not old_value:
+                continue
+            change = (value - old_value) / old_value * 100
+            print(f"{size:>8} {metric:<22} {old_value:>12.2f} {value:>12.2f} {change:>+8.1f}%")
+            if threshold is not None and change > threshold:
+                regressions.append((size, metric, change))
+    return regressions
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Benchmark MusicApp browser, queue and playback hot paths.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="library sizes to generate")
+    parser.add_argument('--repeat', type=int, default=5, help="runs per measurement")
+    parser.add_argument('--output', default="bench_output.json", help="where to write the JSON report")
+    parser.add_argument('--compare', help="a previous report to compare against")
+    parser.add_argument('--fail-threshold', type=float,
+                        help="exit with an error if any metric is slower than the baseline by this many percent")
+    parser.add_argument('--work-dir', help="an empty directory to generate fixtures in (default: a temporary directory)")
+    # Used by run() to measure one library size in a child process.
+    parser.add_argument('--run-size', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--result-file', help=argparse.SUPPRESS)
+    parser.add_argument('--templates', nargs='+', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_size is not None:
+        run_size(args.run_size, args.repeat, args.work_dir, args.templates, args.result_file)
+        return
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="musicapp-bench-")
+    try:
+        report = run(args.sizes, args.repeat, work_dir)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), report, args.fail_threshold)
+        if regressions:
+            print(f"{len(regressions)} metric(s) regressed by more than {args.fail_threshold}%")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_cli()
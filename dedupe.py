@@ -0,0 +1,206 @@
+import hashlib
+import os
+import re
+import struct
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+# Files are compared on their audio payload only, so re-tagged copies are still found.
+# Stages: bucket by payload length -> hash head and tail of the payload -> hash the whole payload.
+# Every stage only looks at files that still collide with another file.
+PARTIAL_HASH_BYTES = 64 * 1024
+READ_BUFFER_SIZE = 1024 * 1024
+DEFAULT_HASH_WORKERS = 8
+# Formats whose tags sit outside the audio stream and can be stripped; for the rest the file size is the payload.
+TAGGED_EXTENSIONS = {'.mp3', '.mp2', '.flac'}
+COPY_SUFFIX = re.compile(r"_copy\d+$")
+
+
+class AudioFile:
+    def __init__(self, path, size, mtime):
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+        self.payload_start = 0
+        self.payload_end = size
+
+    @property
+    def payload_length(self):
+        return self.payload_end - self.payload_start
+
+
+class DuplicateGroup:
+    def __init__(self, digest, files):
+        self.digest = digest
+        self.files = sorted(files, key=keeper_rank)
+
+    @property
+    def keeper(self):
+        return self.files[0]
+
+    @property
+    def duplicates(self):
+        return self.files[1:]
+
+    @property
+    def wasted_bytes(self):
+        return sum(audio_file.size for audio_file in self.duplicates)
+
+
+def keeper_rank(audio_file):
+    # The copy to keep: one without a "_copyN" suffix from paste_files, then the oldest, then the shortest path.
+    stem = os.path.splitext(os.path.basename(audio_file.path))[0]
+    return bool(COPY_SUFFIX.search(stem)), audio_file.mtime, len(audio_file.path), audio_file.path
+
+
+def find_audio_files(root, extensions):
+    # Symlinks are skipped and hard links are reported once: deleting either frees no space and
+    # could remove the only real copy of a track.
+    seen_inodes = set()
+    pending = [root]
+    while pending:
+        directory = pending.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            pending.append(entry.path)
+                        elif (entry.is_file(follow_symlinks=False)
+                              and os.path.splitext(entry.name)[1].lower() in extensions):
+                            stat = entry.stat(follow_symlinks=False)
+                            if not stat.st_ino:
+                                # scandir leaves the inode empty on Windows.
+                                stat = os.stat(entry.path, follow_symlinks=False)
+                            inode = (stat.st_dev, stat.st_ino)
+                            if inode in seen_inodes:
+                                continue
+                            seen_inodes.add(inode)
+                            yield AudioFile(entry.path, stat.st_size, stat.st_mtime)
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+
+
+def read_payload_range(audio_file):
+    # Strips ID3v2 / FLAC metadata from the front and ID3v1 / APEv2 tags from the back.
+    start, end = 0, audio_file.size
+    with open(audio_file.path, 'rb') as f:
+        header = f.read(10)
+        if header[:3] == b"ID3" and len(header) == 10:
+            tag_size = (header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9]
+            start = 10 + tag_size + (10 if header[5] & 0x10 else 0)
+        elif header[:4] == b"fLaC":
+            start = 4
+            while True:
+                f.seek(start)
+                block_header = f.read(4)
+                if len(block_header) < 4:
+                    break
+                start += 4 + int.from_bytes(block_header[1:4], 'big')
+                if block_header[0] & 0x80:
+                    break
+        if end - start >= 128:
+            f.seek(end - 128)
+            if f.read(3) == b"TAG":
+                end -= 128
+        if end - start >= 32:
+            f.seek(end - 32)
+            footer = f.read(32)
+            if footer[:8] == b"APETAGEX":
+                tag_size, _, flags = struct.unpack('<III', footer[12:24])
+                end -= tag_size + (32 if flags & 0x80000000 else 0)
+    audio_file.payload_start = min(start, audio_file.size)
+    audio_file.payload_end = max(end, audio_file.payload_start)
+    return audio_file
+
+
+def partial_hash(audio_file):
+    digest = hashlib.blake2b()
+    with open(audio_file.path, 'rb') as f:
+        f.seek(audio_file.payload_start)
+        digest.update(f.read(min(PARTIAL_HASH_BYTES, audio_file.payload_length)))
+        if audio_file.payload_length > PARTIAL_HASH_BYTES:
+            tail_start = max(audio_file.payload_start + PARTIAL_HASH_BYTES, audio_file.payload_end - PARTIAL_HASH_BYTES)
+            f.seek(tail_start)
+            digest.update(f.read(audio_file.payload_end - tail_start))
+    return digest.hexdigest()
+
+
+def full_hash(audio_file):
+    digest = hashlib.blake2b()
+    remaining = audio_file.payload_length
+    with open(audio_file.path, 'rb', buffering=0) as f:
+        f.seek(audio_file.payload_start)
+        buffer = bytearray(READ_BUFFER_SIZE)
+        view = memoryview(buffer)
+        while remaining > 0:
+            read = f.readinto(view[:min(READ_BUFFER_SIZE, remaining)])
+            if not read:
+                break
+            digest.update(view[:read])
+            remaining -= read
+    return digest.hexdigest()
+
+
+def find_duplicates(root, extensions, max_workers=DEFAULT_HASH_WORKERS, log=print):
+    audio_files = list(find_audio_files(root, extensions))
+    log(f"Duplicate scan: {len(audio_files)} audio files found.")
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        tagged = [f for f in audio_files if os.path.splitext(f.path)[1].lower() in TAGGED_EXTENSIONS]
+        unreadable = {id(f) for f, result in zip(tagged, executor.map(_safe(read_payload_range), tagged))
+                      if result is None}
+        by_payload = defaultdict(list)
+        for audio_file in audio_files:
+            # Empty and tag-only files all hash alike without being copies of the same track.
+            if id(audio_file) not in unreadable and audio_file.payload_length > 0:
+                by_payload[audio_file.payload_length].append(audio_file)
+        candidates = _colliding(by_payload.values())
+        log(f"Duplicate scan: {len(candidates)} files share a payload length.")
+
+        candidates = _regroup(executor, partial_hash, candidates)
+        log(f"Duplicate scan: {len(candidates)} files share a partial hash.")
+
+        groups = defaultdict(list)
+        for audio_file, digest in zip(candidates, executor.map(_safe(full_hash), candidates)):
+            if digest is not None:
+                groups[digest].append(audio_file)
+    duplicate_groups = [DuplicateGroup(digest, files) for digest, files in groups.items() if len(files) > 1]
+    duplicate_groups.sort(key=lambda group: group.wasted_bytes, reverse=True)
+    log(f"Duplicate scan: {len(duplicate_groups)} duplicate groups found.")
+    return duplicate_groups
+
+
+def delete_duplicates(paths):
+    deleted, errors = [], []
+    for path in paths:
+        try:
+            os.remove(path)
+            deleted.append(path)
+        except OSError as e:
+            errors.append((path, e))
+    return deleted, errors
+
+
+def _regroup(executor, hash_function, candidates):
+    buckets = defaultdict(list)
+    for audio_file, digest in zip(candidates, executor.map(_safe(hash_function), candidates)):
+        if digest is not None:
+            buckets[(audio_file.payload_length, digest)].append(audio_file)
+    return _colliding(buckets.values())
+
+
+def _colliding(buckets):
+    return [audio_file for files in buckets if len(files) > 1 for audio_file in files]
+
+
+def _safe(function):
+    # A file that disappears or can't be read mid-scan is simply left out.
+    def wrapper(audio_file):
+        try:
+            return function(audio_file)
+        except OSError:
+            return None
+    return wrapper
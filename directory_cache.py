@@ -0,0 +1,98 @@
+import os
+import threading
+from collections import OrderedDict
+
+DEFAULT_CACHE_SIZE = 256
+# Speculative loads per navigation, kept well below the cache size so prefetching never washes out
+# the folders the user just came from.
+MAX_PREFETCH_PER_REQUEST = 32
+
+
+class DirectoryListing:
+    def __init__(self, path, mtime_ns, folders, files):
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.folders = folders
+        self.files = files
+
+
+class DirectoryCache:
+    # In-memory LRU of directory listings, keyed by path and invalidated whenever the
+    # directory's mtime changes (entries added, removed or renamed).
+    def __init__(self, max_entries=DEFAULT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._listings = OrderedDict()
+        self._lock = threading.Lock()
+        self.pinned_path = None
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._listings)
+
+    def get_listing(self, path):
+        path = os.path.normpath(path)
+        mtime_ns = os.stat(path).st_mtime_ns
+        with self._lock:
+            listing = self._listings.get(path)
+            if listing is not None and listing.mtime_ns == mtime_ns:
+                self._listings.move_to_end(path)
+                self.hits += 1
+                return listing
+            self.misses += 1
+        return self._scan(path, mtime_ns)
+
+    def pin(self, path):
+        # The listing currently shown is never evicted.
+        with self._lock:
+            self.pinned_path = os.path.normpath(path)
+
+    def is_cached(self, path):
+        path = os.path.normpath(path)
+        with self._lock:
+            listing = self._listings.get(path)
+        if listing is None:
+            return False
+        try:
+            return listing.mtime_ns == os.stat(path).st_mtime_ns
+        except OSError:
+            return False
+
+    def invalidate(self, path):
+        # Drops the listing for path and every cached descendant of it.
+        path = os.path.normpath(path)
+        prefix = path.rstrip(os.sep) + os.sep
+        with self._lock:
+            for cached_path in [p for p in self._listings if p == path or p.startswith(prefix)]:
+                del self._listings[cached_path]
+
+    def clear(self):
+        with self._lock:
+            self._listings.clear()
+
+    def prefetch_listing(self, path):
+        # Speculative load run from the background scheduler; a folder that vanished is not an error.
+        if self.is_cached(path):
+            return
+        try:
+            self.get_listing(path)
+        except OSError:
+            pass
+
+    def _scan(self, path, mtime_ns):
+        folders, files = [], []
+        with os.scandir(path) as entries:
+            for entry in entries:
+                (folders if entry.is_dir() else files).append(entry.name)
+        listing = DirectoryListing(path, mtime_ns, sorted(folders), sorted(files))
+        with self._lock:
+            self._listings[path] = listing
+            self._listings.move_to_end(path)
+            while len(self._listings) > self.max_entries:
+                oldest_path = next(iter(self._listings))
+                if oldest_path == self.pinned_path:
+                    self._listings.move_to_end(oldest_path)
+                    continue
+                del self._listings[oldest_path]
+        return listing
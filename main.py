@@ -1,23 +1,47 @@
+import sys
+from single_instance import InstanceServer, send_to_running_instance, parse_arguments
+
+# Hand the arguments to an already running player before pygame, pylast and QApplication are loaded.
+if __name__ == "__main__" and send_to_running_instance(sys.argv[1:]):
+    sys.exit(0)
+
 import configparser
 from pathlib import Path
-import sys
 import os
 import datetime
 import shutil
 import random
+from collections import OrderedDict
 import pygame
+import mutagen
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QTreeWidget, QTreeWidgetItem,
                             QPushButton, QLabel, QInputDialog, QMessageBox, QHBoxLayout,
                             QSlider, QAbstractItemView, QMenu, QAction, QLineEdit, QHeaderView,
-                            QFileDialog)
-from PyQt5.QtGui import QIcon
-from PyQt5.QtCore import Qt, QTimer, QPoint, QThread, pyqtSignal
+                            QFileDialog, QListView, QDialog, QDialogButtonBox)
+from PyQt5.QtGui import QIcon, QFont
+from PyQt5.QtCore import Qt, QTimer, QPoint, QThread, pyqtSignal, QAbstractListModel, QModelIndex
 from last_fm import LastFMClient
+from directory_cache import DirectoryCache, MAX_PREFETCH_PER_REQUEST
+from scheduler import JobScheduler, PRIORITY_PLAYING, PRIORITY_VISIBLE, PRIORITY_BACKGROUND
+from playlist_store import PlaylistStore, PlaylistError
+from dedupe import find_duplicates, delete_duplicates
 from dotenv import load_dotenv
 pygame.mixer.init()
 
+# Rows the playlist view lays out per event loop pass, so edits to huge playlists don't freeze the window.
+PLAYLIST_LAYOUT_BATCH = 2000
+
 SUPPORTED_AUDIO_EXTENSIONS = {'.wav', '.ogg', '.mp3', '.mid', '.midi', '.flac', '.aif', '.aiff', '.mp2'}
 
+
+def probe_audio_length(audio_path):
+    # Reading the stream header is far cheaper than decoding the whole file into a Sound.
+    audio = mutagen.File(audio_path)
+    if audio is not None and audio.info is not None:
+        return audio.info.length
+    return pygame.mixer.Sound(audio_path).get_length()
+
+
 class AuthThread(QThread):
     finished = pyqtSignal(bool)
     
@@ -29,9 +53,153 @@ class AuthThread(QThread):
         success = self.client.authenticate()
         self.finished.emit(success)
 
+class DuplicateScanThread(QThread):
+    # The scan runs for minutes, so it gets its own thread instead of holding the scheduler's background lane.
+    scan_finished = pyqtSignal(object)
+
+    def __init__(self, root, max_workers, log):
+        super().__init__()
+        self.root = root
+        self.max_workers = max_workers
+        self.log = log
+
+    def run(self):
+        try:
+            groups = find_duplicates(self.root, SUPPORTED_AUDIO_EXTENSIONS, max_workers=self.max_workers, log=self.log)
+        except Exception as e:
+            self.log(f"Duplicate scan failed: {e}", error=True)
+            groups = []
+        self.scan_finished.emit(groups)
+
+
+class PlaylistModel(QAbstractListModel):
+    # Only the pages the view actually paints are read from the playlist store.
+    PAGE_SIZE = 256
+    MAX_CACHED_PAGES = 16
+
+    def __init__(self, store):
+        super().__init__()
+        self.store = store
+        self.playlist_id = None
+        self.row_count = 0
+        self.cursor_row = -1
+        self.pages = OrderedDict()
+
+    def set_playlist(self, playlist_id):
+        self.beginResetModel()
+        self.playlist_id = playlist_id
+        self.row_count = self.store.count(playlist_id) if playlist_id is not None else 0
+        self.cursor_row = -1
+        self.pages.clear()
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.row_count
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= self.row_count:
+            return None
+        if role == Qt.DisplayRole:
+            return os.path.basename(self.entry(index.row())[1])
+        if role == Qt.ToolTipRole:
+            return self.entry(index.row())[1]
+        if role == Qt.FontRole and index.row() == self.cursor_row:
+            font = QFont()
+            font.setBold(True)
+            return font
+        return None
+
+    def entry(self, row):
+        page_number = row // self.PAGE_SIZE
+        page = self.pages.get(page_number)
+        if page is None:
+            page = self.store.entries(self.playlist_id, page_number * self.PAGE_SIZE, self.PAGE_SIZE)
+            self.pages[page_number] = page
+            if len(self.pages) > self.MAX_CACHED_PAGES:
+                self.pages.popitem(last=False)
+        else:
+            self.pages.move_to_end(page_number)
+        return page[row % self.PAGE_SIZE]
+
+    def set_cursor_row(self, row):
+        # No dataChanged here: on a 100k+ playlist each emit makes the view re-query rowCount for every row.
+        # The view repaints the two affected rows itself (AudioPlayer.set_playlist_cursor_row).
+        previous_row, self.cursor_row = self.cursor_row, row
+        return previous_row
+
+    def rows_appended(self):
+        new_count = self.store.count(self.playlist_id)
+        if new_count <= self.row_count:
+            return
+        self.beginInsertRows(QModelIndex(), self.row_count, new_count - 1)
+        self.pages.pop(self.row_count // self.PAGE_SIZE, None)
+        self.row_count = new_count
+        self.endInsertRows()
+
+    def row_moved(self, from_row, to_row):
+        self.beginMoveRows(QModelIndex(), from_row, from_row, QModelIndex(), to_row + 1 if to_row > from_row else to_row)
+        self.pages.clear()
+        self.endMoveRows()
+
+    def row_removed(self, row):
+        self.beginRemoveRows(QModelIndex(), row, row)
+        self.pages.clear()
+        self.row_count -= 1
+        self.endRemoveRows()
+
+
+class DuplicatesDialog(QDialog):
+    # One top-level row per group; every copy except the suggested keeper starts out checked for deletion.
+    def __init__(self, groups, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Duplicate Files")
+        self.resize(700, 500)
+        layout = QVBoxLayout(self)
+        wasted = sum(group.wasted_bytes for group in groups)
+        layout.addWidget(QLabel(f"{len(groups)} groups of duplicates, {wasted / 1024 ** 2:.1f} MB reclaimable."))
+        self.tree = QTreeWidget()
+        self.tree.setHeaderLabels(["File", "Size"])
+        for group in groups:
+            group_item = QTreeWidgetItem([os.path.basename(group.keeper.path), f"{len(group.files)} copies"])
+            for audio_file in group.files:
+                file_item = QTreeWidgetItem([audio_file.path, f"{audio_file.size / 1024 ** 2:.1f} MB"])
+                file_item.setCheckState(0, Qt.Unchecked if audio_file is group.keeper else Qt.Checked)
+                group_item.addChild(file_item)
+            self.tree.addTopLevelItem(group_item)
+        self.tree.expandAll()
+        self.tree.header().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        layout.addWidget(self.tree)
+        buttons = QDialogButtonBox(QDialogButtonBox.Cancel)
+        buttons.addButton("Delete Checked", QDialogButtonBox.AcceptRole)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+    def checked_paths(self):
+        paths = []
+        for i in range(self.tree.topLevelItemCount()):
+            group_item = self.tree.topLevelItem(i)
+            children = [group_item.child(j) for j in range(group_item.childCount())]
+            checked = [child.text(0) for child in children if child.checkState(0) == Qt.Checked]
+            # Never delete every copy of a group.
+            if len(checked) < len(children):
+                paths.extend(checked)
+        return paths
+
+
 class AudioPlayer(QMainWindow):
+    background_job_finished = pyqtSignal(object, object)
+
     def __init__(self):
         super().__init__()
+        self.directory_cache = DirectoryCache()
+        self.scheduler = JobScheduler()
+        self.background_job_finished.connect(self.handle_background_job_result)
+        self.active_audio_path = None
+        self.play_queue = []
+        self.duplicate_scan_thread = None
+        self.playlist_store = PlaylistStore(self.get_playlist_db_path())
+        self.active_playlist_id = None
         self.init_ui()
         self.load_files()
         self.timer = QTimer(self)
@@ -48,7 +216,7 @@ class AudioPlayer(QMainWindow):
         self.lastfm_client = LastFMClient()
         self.connected=bool(self.lastfm_client.session_key)
         self.init_lastfm_menu()
-        
+        self.init_playlist_menu()
 
     def init_ui(self):
         central_widget = QWidget()
@@ -59,6 +227,7 @@ class AudioPlayer(QMainWindow):
         self.load_stylesheet()
         self.init_menu_bar()
         self.init_file_browser()
+        self.init_playlist_view()
         self.init_audio_controls()
         self.layout.addLayout(self.controls_layout)
 
@@ -94,6 +263,10 @@ class AudioPlayer(QMainWindow):
         self.loop_audio_action.setCheckable(True)
         self.loop_audio_action.setChecked(False)
         self.settings_menu.addAction(self.loop_audio_action)
+        # Background job counters
+        self.job_stats_action = QAction("Background Jobs", self)
+        self.job_stats_action.triggered.connect(self.show_background_job_stats)
+        self.settings_menu.addAction(self.job_stats_action)
 
         self.setWindowIcon(QIcon(self.get_resource_path("icons/app_icon.svg")))
 
@@ -122,6 +295,8 @@ class AudioPlayer(QMainWindow):
         self.file_browser.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
         self.file_browser.customContextMenuRequested.connect(self.show_right_click_menu)
         self.file_browser.itemDoubleClicked.connect(self.file_item_double_clicked)
+        self.file_browser.itemExpanded.connect(self.file_item_expanded)
+        self.file_browser.setExpandsOnDoubleClick(False)
         header = self.file_browser.header()
         header.setSectionResizeMode(0, QHeaderView.ResizeMode.Interactive)
         header.setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
@@ -129,6 +304,25 @@ class AudioPlayer(QMainWindow):
         self.layout.addWidget(self.file_browser)
         QTimer.singleShot(0, self.resize_columns)
 
+    def init_playlist_view(self):
+        self.playlist_panel = QWidget()
+        playlist_layout = QVBoxLayout(self.playlist_panel)
+        playlist_layout.setContentsMargins(0, 0, 0, 0)
+        self.playlist_label = QLabel(self)
+        playlist_layout.addWidget(self.playlist_label)
+        self.playlist_model = PlaylistModel(self.playlist_store)
+        self.playlist_view = QListView()
+        self.playlist_view.setModel(self.playlist_model)
+        self.playlist_view.setUniformItemSizes(True)
+        self.playlist_view.setLayoutMode(QListView.Batched)
+        self.playlist_view.setBatchSize(PLAYLIST_LAYOUT_BATCH)
+        self.playlist_view.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.playlist_view.customContextMenuRequested.connect(self.show_playlist_menu)
+        self.playlist_view.doubleClicked.connect(lambda index: self.play_playlist_entry(index.row()))
+        playlist_layout.addWidget(self.playlist_view)
+        self.playlist_panel.hide()
+        self.layout.addWidget(self.playlist_panel)
+
     def resize_columns(self):
         total_width = self.file_browser.viewport().width()
         if total_width > 0:
@@ -200,6 +394,9 @@ class AudioPlayer(QMainWindow):
         config_dir.mkdir(exist_ok=True)
         return config_dir / "settings.ini"
 
+    def get_playlist_db_path(self):
+        return self.get_config_path().parent / "playlists.db"
+
     def load_settings(self):
         config = configparser.ConfigParser()
         config_path = self.get_config_path()
@@ -214,6 +411,11 @@ class AudioPlayer(QMainWindow):
                 if saved_path:
                     self.folder_path_field.setText(saved_path)
                     self.load_files()
+                # Load active playlist
+                playlist_name = config.get('DEFAULT', 'playlist', fallback="")
+                playlist_id = self.playlist_store.find_playlist(playlist_name) if playlist_name else None
+                if playlist_id is not None:
+                    self.open_playlist(playlist_id)
                 # Load playback state
                 current_song = config.get('DEFAULT', 'current_song', fallback="")
                 last_position = float(config.get('DEFAULT', 'last_position', fallback=0))
@@ -232,7 +434,8 @@ class AudioPlayer(QMainWindow):
             'folder_path': self.folder_path_field.text(),
             'current_song': self.active_audio_name_label.text() if self.active_audio_name_label.text() != "No Audio Playing" else "",
             'last_position': str(self.last_seek_position),
-            'was_playing': str(not self.paused)
+            'was_playing': str(not self.paused),
+            'playlist': self.playlist_store.playlist_name(self.active_playlist_id) if self.active_playlist_id is not None else ""
         }
 
         try:
@@ -242,24 +445,34 @@ class AudioPlayer(QMainWindow):
             self.log(f"Error saving settings: {e}")
 
     def restore_playback(self, song_name, position, was_playing):
+        # Resume from the stored playlist cursor when the saved song was playing from the active playlist.
+        if self.active_playlist_id is not None:
+            cursor_row = self.playlist_store.cursor_index(self.active_playlist_id)
+            if cursor_row != -1 and os.path.basename(self.playlist_model.entry(cursor_row)[1]) == song_name:
+                self.play_playlist_entry(cursor_row)
+                self.restore_playback_position(position, was_playing)
+                return
         for i in range(self.file_browser.topLevelItemCount()):
             item = self.file_browser.topLevelItem(i)
             if item.text(0) == song_name:
                 self.play_audio(self.get_file_browser_item_path(item))
+                self.restore_playback_position(position, was_playing)
+                return
+        self.log(f"Previous song '{song_name}' not found in current folder")
 
-                QTimer.singleShot(100, lambda:pygame.mixer.music.set_pos(position) if pygame.mixer.music.get_busy() else None)
+    def restore_playback_position(self, position, was_playing):
+        QTimer.singleShot(100, lambda:pygame.mixer.music.set_pos(position) if pygame.mixer.music.get_busy() else None)
 
-                self.last_seek_position = position
-                self.seek_slider.setValue(int(position))
-                self.current_playtime_label.setText(self.format_time(position))
+        self.last_seek_position = position
+        self.seek_slider.setValue(int(position))
+        self.current_playtime_label.setText(self.format_time(position))
 
-                if not was_playing:
-                    self.trigger_play_button()
-                return
-        self.log(f"Previous song '{song_name}' not found in current folder")
+        if not was_playing:
+            self.trigger_play_button()
 
     def closeEvent(self, event):
         self.save_settings()
+        self.scheduler.shutdown()
         super().closeEvent(event)
 
     def create_button(self, text, callback, tooltip=None):
@@ -297,6 +510,9 @@ class AudioPlayer(QMainWindow):
             play_action = QAction("Play")
             play_action.triggered.connect(self.play_first_selected_file)
             menu.addAction(play_action)
+            add_to_playlist_action = QAction("Add to Playlist", self)
+            add_to_playlist_action.triggered.connect(self.add_selected_files_to_playlist)
+            menu.addAction(add_to_playlist_action)
             rename_action = QAction("Rename", self)
             rename_action.triggered.connect(self.rename_file)
             rename_action.setEnabled(len(selected_items) == 1)
@@ -306,9 +522,10 @@ class AudioPlayer(QMainWindow):
                 action = QAction(action_name)
                 action.triggered.connect(method)
                 menu.addAction(action)
-        for action_name, method in {"Create New Folder": self.create_new_folder, "Refresh Directory": self.load_files,
+        for action_name, method in {"Create New Folder": self.create_new_folder, "Refresh Directory": self.refresh_directory,
                                     "Sort A - Z": self.sort_files,
-                                    "Shuffle Audio Files": self.shuffle_audio_files}.items():
+                                    "Shuffle Audio Files": self.shuffle_audio_files,
+                                    "Find Duplicates": self.find_duplicate_files}.items():
             action = QAction(action_name)
             action.triggered.connect(method)
             menu.addAction(action)
@@ -316,22 +533,67 @@ class AudioPlayer(QMainWindow):
 
     def load_files(self):
         self.file_browser.clear()
+        self.scheduler.cancel_group("browse")
         path = self.folder_path_field.text()
+        self.directory_cache.pin(path)
         try:
-            with os.scandir(path) as entries:
-                folders, audio_files = [], []
-                for entry in entries:
-                    (folders if entry.is_dir() else audio_files).append(entry.name)
-                for folder in sorted(folders):
-                    self.file_browser.addTopLevelItem(QTreeWidgetItem([folder]))
-                for audio_file in sorted(audio_files):
-                    self.file_browser.addTopLevelItem(QTreeWidgetItem([audio_file]))
+            listing = self.directory_cache.get_listing(path)
+            self.file_browser.addTopLevelItems(self.create_file_browser_items(listing))
+            self.prefetch_neighbour_directories(listing)
         except Exception as e:
             self.log(f"Error loading files: {e}", error=True)
 
+    def refresh_directory(self):
+        self.directory_cache.invalidate(self.folder_path_field.text())
+        self.load_files()
+
+    def create_file_browser_items(self, listing):
+        items = []
+        for folder in listing.folders:
+            folder_item = QTreeWidgetItem([folder, "Folder"])
+            folder_item.setChildIndicatorPolicy(QTreeWidgetItem.ShowIndicator)
+            items.append(folder_item)
+        for audio_file in listing.files:
+            items.append(QTreeWidgetItem([audio_file]))
+        return items
+
+    def prefetch_neighbour_directories(self, listing):
+        # Parent first, then children, then siblings, capped per navigation.
+        paths = []
+        parent_path = os.path.dirname(listing.path)
+        if parent_path and parent_path != listing.path:
+            paths.append(parent_path)
+        paths.extend(os.path.join(listing.path, folder) for folder in listing.folders)
+        if parent_path and parent_path != listing.path and self.directory_cache.is_cached(parent_path):
+            parent_listing = self.directory_cache.get_listing(parent_path)
+            paths.extend(os.path.join(parent_path, folder) for folder in parent_listing.folders
+                         if os.path.join(parent_path, folder) != listing.path)
+        for path in paths[:MAX_PREFETCH_PER_REQUEST]:
+            self.run_in_background(self.directory_cache.prefetch_listing, path,
+                                   priority=PRIORITY_BACKGROUND, group="browse")
+
+    def file_item_expanded(self, item):
+        try:
+            listing = self.directory_cache.get_listing(self.get_file_browser_item_path(item))
+        except Exception as e:
+            self.log(f"Error loading files: {e}", error=True)
+            return
+        # Children are rebuilt only when the folder changed since they were created.
+        if item.childCount() > 0 and item.data(0, Qt.UserRole) == listing.mtime_ns:
+            return
+        item.takeChildren()
+        item.setData(0, Qt.UserRole, listing.mtime_ns)
+        children = self.create_file_browser_items(listing)
+        if not children:
+            item.setChildIndicatorPolicy(QTreeWidgetItem.DontShowIndicatorWhenChildless)
+            return
+        item.addChildren(children)
+        for folder in listing.folders[:MAX_PREFETCH_PER_REQUEST]:
+            self.run_in_background(self.directory_cache.prefetch_listing, os.path.join(listing.path, folder),
+                                   priority=PRIORITY_VISIBLE, group="browse")
+
     def file_item_double_clicked(self, item, column):
-        current_path = self.folder_path_field.text()
-        new_path = os.path.join(current_path, item.text(0))
+        new_path = self.get_file_browser_item_path(item)
         if os.path.isdir(new_path):
             self.folder_path_field.setText(new_path)
             self.load_files()
@@ -344,7 +606,9 @@ class AudioPlayer(QMainWindow):
             self.folder_path_field.setText(parent_path)
             self.load_files()
 
-    def play_audio(self, audio_path):
+    def play_audio(self, audio_path, playlist_index=-1):
+        self.active_playlist_index = playlist_index
+        self.set_playlist_cursor_row(playlist_index)
         self.PlayerStarted = True
         self.log(f"Attempting to play: {audio_path}")
         if not os.path.exists(audio_path):
@@ -352,18 +616,26 @@ class AudioPlayer(QMainWindow):
             return
         pygame.mixer.music.load(audio_path)
         pygame.mixer.music.play(start=0)
+        self.active_audio_path = audio_path
         self.active_audio_name_label.setText(os.path.basename(audio_path))
         self.current_playtime_label.setText("0:00")
+        self.audio_length_label.setText("0:00")
         self.paused = False
         self.last_seek_position = 0
         self.seek_slider.setDisabled(False)
-        sound = pygame.mixer.Sound(audio_path)
-        self.audio_length_label.setText(self.format_time(sound.get_length()))
+        self.scheduler.cancel_group("playback")
+        self.scheduler.set_throttled(True)
+        self.run_in_background(probe_audio_length, audio_path, priority=PRIORITY_PLAYING, group="playback",
+                               on_result=lambda length: self.set_audio_length(audio_path, length))
         self.play_button.setText("||")
 
-    def play_first_audio_in_folder(self):
-        for i in range(self.file_browser.topLevelItemCount()):
-            item = self.file_browser.topLevelItem(i)
+    def set_audio_length(self, audio_path, length):
+        if audio_path == self.active_audio_path:
+            self.audio_length_label.setText(self.format_time(length))
+
+    def play_first_audio_in_folder(self, parent=None):
+        for i in range(self.get_browser_item_count(parent)):
+            item = self.get_browser_item(parent, i)
             if item.text(1) != "Folder":
                 self.file_browser.clearSelection()
                 item.setSelected(True)
@@ -388,33 +660,44 @@ class AudioPlayer(QMainWindow):
         elif self.paused:
             pygame.mixer.music.unpause()
             self.paused = False
+            self.scheduler.set_throttled(True)
             self.play_button.setText("||")
         else:
             pygame.mixer.music.pause()
             self.play_button.setText("▶")
             self.paused = True
+            self.scheduler.set_throttled(False)
 
     def play_next_audio_file(self):
-        active_index = self.get_active_audio_index()
+        if self.play_queue:
+            self.play_audio(self.play_queue.pop(0), self.active_playlist_index)
+            return
+        if self.active_playlist_index != -1 and self.playlist_model.row_count:
+            self.play_playlist_entry((self.active_playlist_index + 1) % self.playlist_model.row_count)
+            return
+        parent, active_index = self.get_active_audio_position()
         self.log(f"Active index: {active_index}")
         if active_index != -1:
-            next_audio_item = self.file_browser.topLevelItem(active_index + 1)
+            next_audio_item = self.get_browser_item(parent, active_index + 1)
             if next_audio_item:
                 self.file_browser.clearSelection()
                 next_audio_item.setSelected(True)
                 self.play_audio(self.get_file_browser_item_path(next_audio_item))
                 return
             self.log("Reached the end of the list, playing first audio.")
-        self.play_first_audio_in_folder()
+        self.play_first_audio_in_folder(parent)
         self.file_browser.clearFocus()
 
     def play_previous_audio_file(self):
-        active_index = self.get_active_audio_index()
+        if self.active_playlist_index != -1 and self.playlist_model.row_count:
+            self.play_playlist_entry((self.active_playlist_index - 1) % self.playlist_model.row_count)
+            return
+        parent, active_index = self.get_active_audio_position()
         if active_index != -1:
-            prev_audio_item = self.file_browser.topLevelItem(active_index - 1)
+            prev_audio_item = self.get_browser_item(parent, active_index - 1)
             if prev_audio_item:
                 if prev_audio_item.text(1) == "Folder":
-                    last_audio_item = self.file_browser.topLevelItem(self.file_browser.topLevelItemCount() - 1)
+                    last_audio_item = self.get_browser_item(parent, self.get_browser_item_count(parent) - 1)
                     self.file_browser.clearSelection()
                     last_audio_item.setSelected(True)
                     self.play_audio(self.get_file_browser_item_path(last_audio_item))
@@ -423,27 +706,247 @@ class AudioPlayer(QMainWindow):
                 prev_audio_item.setSelected(True)
                 self.play_audio(self.get_file_browser_item_path(prev_audio_item))
                 return
-            self.play_first_audio_in_folder()
+            self.play_first_audio_in_folder(parent)
+
+    def handle_remote_command(self, command, paths):
+        self.log(f"Received command: {command} {paths}")
+        if command == "show":
+            self.showNormal()
+            self.raise_()
+            self.activateWindow()
+        elif command == "play":
+            if self.paused or self.active_audio_name_label.text() == "No Audio Playing":
+                self.trigger_play_button()
+        elif command == "pause":
+            if self.PlayerStarted and not self.paused:
+                self.trigger_play_button()
+        elif command == "toggle":
+            self.trigger_play_button()
+        elif command == "next":
+            self.play_next_audio_file()
+        elif command == "previous":
+            self.play_previous_audio_file()
+        elif command == "enqueue":
+            audio_paths = self.get_audio_files_for_paths(paths)
+            self.play_queue.extend(audio_paths)
+            self.log(f"Enqueued {len(audio_paths)} file(s).")
+        elif command == "open":
+            self.open_paths(paths)
+        else:
+            self.log(f"Unknown command: {command}", error=True)
+
+    def open_paths(self, paths):
+        if not paths:
+            return
+        first_path = paths[0]
+        folder_path = first_path if os.path.isdir(first_path) else os.path.dirname(first_path)
+        self.folder_path_field.setText(folder_path)
+        self.load_files()
+        audio_paths = self.get_audio_files_for_paths(paths)
+        if audio_paths:
+            self.play_queue = audio_paths[1:]
+            self.play_audio(audio_paths[0])
+
+    def get_audio_files_for_paths(self, paths):
+        audio_paths = []
+        for path in paths:
+            if os.path.isdir(path):
+                try:
+                    listing = self.directory_cache.get_listing(path)
+                except OSError as e:
+                    self.log(f"Error loading files: {e}", error=True)
+                    continue
+                audio_paths.extend(os.path.join(listing.path, name) for name in listing.files
+                                   if name.lower().endswith(tuple(SUPPORTED_AUDIO_EXTENSIONS)))
+            elif path.lower().endswith(tuple(SUPPORTED_AUDIO_EXTENSIONS)):
+                audio_paths.append(path)
+        return audio_paths
+
+    def init_playlist_menu(self):
+        self.playlist_menu = self.menuBar().addMenu('Playlists')
+        self.playlist_menu.aboutToShow.connect(self.update_playlist_menu)
+        self.update_playlist_menu()
+
+    def update_playlist_menu(self):
+        self.playlist_menu.clear()
+        for action_name, method in {"New Playlist": self.create_playlist, "Import M3U": self.import_playlist,
+                                    "Export Playlist": self.export_playlist,
+                                    "Delete Playlist": self.delete_playlist,
+                                    "Close Playlist": lambda: self.open_playlist(None)}.items():
+            action = QAction(action_name, self.playlist_menu)
+            action.triggered.connect(method)
+            action.setEnabled(action_name in ("New Playlist", "Import M3U") or self.active_playlist_id is not None)
+            self.playlist_menu.addAction(action)
+        self.playlist_menu.addSeparator()
+        for playlist_id, name, entry_count in self.playlist_store.list_playlists():
+            action = QAction(f"{name} ({entry_count})", self.playlist_menu)
+            action.setCheckable(True)
+            action.setChecked(playlist_id == self.active_playlist_id)
+            action.triggered.connect(lambda checked, playlist_id=playlist_id: self.open_playlist(playlist_id))
+            self.playlist_menu.addAction(action)
+
+    def open_playlist(self, playlist_id):
+        self.active_playlist_id = playlist_id
+        self.active_playlist_index = -1
+        self.playlist_model.set_playlist(playlist_id)
+        if playlist_id is None:
+            self.playlist_panel.hide()
+            return
+        self.playlist_label.setText(self.playlist_store.playlist_name(playlist_id))
+        self.set_playlist_cursor_row(self.playlist_store.cursor_index(playlist_id))
+        if 0 <= self.playlist_model.cursor_row:
+            self.playlist_view.scrollTo(self.playlist_model.index(self.playlist_model.cursor_row))
+        self.playlist_panel.show()
+
+    def create_playlist(self):
+        name, ok = QInputDialog.getText(self, "New Playlist", "Enter playlist name:")
+        if not ok or not name.strip():
+            return None
+        try:
+            playlist_id = self.playlist_store.create_playlist(name.strip())
+        except PlaylistError as e:
+            QMessageBox.warning(self, "New Playlist", str(e))
+            return None
+        self.open_playlist(playlist_id)
+        return playlist_id
+
+    def delete_playlist(self):
+        name = self.playlist_store.playlist_name(self.active_playlist_id)
+        if QMessageBox.question(self, "Delete Playlist", f"Are you sure you want to delete '{name}'?",
+                                QMessageBox.Yes | QMessageBox.No) == QMessageBox.Yes:
+            self.playlist_store.delete_playlist(self.active_playlist_id)
+            self.open_playlist(None)
+
+    def import_playlist(self):
+        m3u_path, _ = QFileDialog.getOpenFileName(self, "Import Playlist", self.folder_path_field.text(),
+                                                  "Playlists (*.m3u *.m3u8)")
+        if not m3u_path:
+            return
+        name = os.path.splitext(os.path.basename(m3u_path))[0]
+        if self.playlist_store.find_playlist(name) is not None:
+            QMessageBox.warning(self, "Import Playlist", f"A playlist named '{name}' already exists.")
+            return
+        self.log(f"Importing playlist: {m3u_path}")
+        self.run_in_background(self.playlist_store.import_m3u, m3u_path, name, priority=PRIORITY_VISIBLE,
+                               on_result=self.open_playlist)
+
+    def export_playlist(self):
+        name = self.playlist_store.playlist_name(self.active_playlist_id)
+        m3u_path, _ = QFileDialog.getSaveFileName(self, "Export Playlist",
+                                                  os.path.join(self.folder_path_field.text(), f"{name}.m3u8"),
+                                                  "Playlists (*.m3u *.m3u8)")
+        if m3u_path:
+            self.run_in_background(self.playlist_store.export_m3u, self.active_playlist_id, m3u_path,
+                                   priority=PRIORITY_VISIBLE,
+                                   on_result=lambda _: self.log(f"Exported playlist to {m3u_path}"))
+
+    def add_selected_files_to_playlist(self):
+        if self.active_playlist_id is None and self.create_playlist() is None:
+            return
+        paths = [self.get_file_browser_item_path(item) for item in self.file_browser.selectedItems()]
+        added = self.playlist_store.append(self.active_playlist_id, self.get_audio_files_for_paths(paths))
+        self.playlist_model.rows_appended()
+        self.log(f"Added {added} file(s) to playlist.")
+
+    def set_playlist_cursor_row(self, row):
+        previous_row = self.playlist_model.set_cursor_row(row)
+        for changed_row in (previous_row, row):
+            if 0 <= changed_row < self.playlist_model.row_count:
+                rect = self.playlist_view.visualRect(self.playlist_model.index(changed_row))
+                self.playlist_view.viewport().update(rect)
+
+    def play_playlist_entry(self, row):
+        entry = self.playlist_model.entry(row)
+        self.playlist_store.set_cursor(self.active_playlist_id, entry[0])
+        self.play_audio(entry[1], row)
+
+    def show_playlist_menu(self, pos: QPoint):
+        index = self.playlist_view.indexAt(pos)
+        if not index.isValid():
+            return
+        row = index.row()
+        menu = QMenu(self)
+        for action_name, method in {"Play": lambda: self.play_playlist_entry(row),
+                                    "Move Up": lambda: self.move_playlist_entry(row, row - 1),
+                                    "Move Down": lambda: self.move_playlist_entry(row, row + 1),
+                                    "Move to Top": lambda: self.move_playlist_entry(row, 0),
+                                    "Remove": lambda: self.remove_playlist_entry(row)}.items():
+            action = QAction(action_name, menu)
+            action.triggered.connect(method)
+            menu.addAction(action)
+        menu.exec_(self.playlist_view.viewport().mapToGlobal(pos))
+
+    def move_playlist_entry(self, from_row, to_row):
+        if not 0 <= to_row < self.playlist_model.row_count or from_row == to_row:
+            return
+        self.playlist_store.move(self.active_playlist_id, from_row, to_row)
+        self.playlist_model.row_moved(from_row, to_row)
+        self.update_playlist_cursor()
+
+    def remove_playlist_entry(self, row):
+        removing_cursor = row == self.playlist_model.cursor_row
+        self.playlist_store.remove(self.active_playlist_id, row)
+        self.playlist_model.row_removed(row)
+        if removing_cursor and self.playlist_model.row_count:
+            # Point the cursor at the entry before the removed one, so "next" plays the entry that took its row.
+            entry = self.playlist_model.entry((row - 1) % self.playlist_model.row_count)
+            self.playlist_store.set_cursor(self.active_playlist_id, entry[0])
+        self.update_playlist_cursor()
+
+    def update_playlist_cursor(self):
+        cursor_row = self.playlist_store.cursor_index(self.active_playlist_id)
+        if self.active_playlist_index != -1:
+            self.active_playlist_index = cursor_row
+        self.set_playlist_cursor_row(cursor_row)
+
+    def find_duplicate_files(self):
+        if self.duplicate_scan_thread is not None and self.duplicate_scan_thread.isRunning():
+            self.log("A duplicate scan is already running.")
+            return
+        root = self.folder_path_field.text()
+        # Fewer hashing threads while music is playing, so the scan never starves the mixer.
+        max_workers = 2 if self.PlayerStarted and not self.paused else 8
+        self.log(f"Scanning {root} for duplicates...")
+        self.duplicate_scan_thread = DuplicateScanThread(root, max_workers, self.log)
+        self.duplicate_scan_thread.scan_finished.connect(self.show_duplicate_files)
+        self.duplicate_scan_thread.start()
+
+    def show_duplicate_files(self, groups):
+        if not groups:
+            QMessageBox.information(self, "Find Duplicates", "No duplicate files found.")
+            return
+        dialog = DuplicatesDialog(groups, self)
+        if dialog.exec_() != QDialog.Accepted:
+            return
+        paths = dialog.checked_paths()
+        if not paths or QMessageBox.question(self, "Delete", f"Are you sure you want to delete {len(paths)} file(s)?",
+                                             QMessageBox.Yes | QMessageBox.No) != QMessageBox.Yes:
+            return
+        deleted, errors = delete_duplicates(paths)
+        for path, e in errors:
+            self.log(f"Error deleting {path}: {e}", error=True)
+        self.log(f"Deleted {len(deleted)} duplicate file(s).")
+        for path in deleted:
+            self.directory_cache.invalidate(os.path.dirname(path))
+        self.load_files()
 
     def rename_file(self):
-        current_path = self.folder_path_field.text()
         selected_items = self.file_browser.selectedItems()
         if not selected_items:
             QMessageBox.warning(self, "Rename", "No file or folder selected.")
             return
         item = selected_items[0]
-        old_name = item.text(0)
-        file_extension = item.text(1)
-        new_name, ok = QInputDialog.getText(self, "Rename", "Enter new name:", text=old_name)
+        old_path = self.get_file_browser_item_path(item)
+        new_name, ok = QInputDialog.getText(self, "Rename", "Enter new name:", text=item.text(0))
         if not ok or not new_name.strip():
             return
-        new_path = os.path.join(current_path, new_name)
-        if os.path.exists(new_path + file_extension):
+        new_path = os.path.join(os.path.dirname(old_path), new_name)
+        if os.path.exists(new_path):
             QMessageBox.warning(self, "Rename", "A file or folder with this name already exists.")
             return
         try:
-            os.rename(os.path.join(current_path, old_name) + file_extension, new_path + file_extension)
-            self.load_files()
+            os.rename(old_path, new_path)
+            self.refresh_directory()
         except Exception as e:
             self.log(f"Error renaming file: {e}", error=True)
 
@@ -464,7 +967,7 @@ class AudioPlayer(QMainWindow):
         current_path = self.folder_path_field.text()
         selected_items = self.file_browser.selectedItems()
         destination_path = next(
-            (os.path.join(current_path, item.text(0)) for item in selected_items if item.text(1) == "Folder"),
+            (self.get_file_browser_item_path(item) for item in selected_items if item.text(1) == "Folder"),
             current_path)
         for item_path in self.clipboard:
             item_name = os.path.basename(item_path)
@@ -485,7 +988,7 @@ class AudioPlayer(QMainWindow):
         if self.cut_mode:
             self.clipboard = []
             self.cut_mode = False
-        self.load_files()
+        self.refresh_directory()
 
     def delete_files(self):
         selected_items = self.file_browser.selectedItems()
@@ -503,14 +1006,14 @@ class AudioPlayer(QMainWindow):
                         self.log(f"Deleted: {item_path}")
                     except Exception as e:
                         self.log(f"Error deleting {item_path}: {e}")
-        self.load_files()
+        self.refresh_directory()
 
     def create_new_folder(self):
         current_path = self.folder_path_field.text()
         folder_name, ok = QInputDialog.getText(self, "New Folder", "Enter folder name:")
         if ok and folder_name:
             os.mkdir(os.path.join(current_path, folder_name))
-            self.load_files()
+            self.refresh_directory()
 
     def sort_files(self):
         self.log("Sorted files.")
@@ -569,6 +1072,8 @@ class AudioPlayer(QMainWindow):
             self.seek_slider_changed(int(value))
 
     def seek_slider_changed(self, value):
+        if self.seek_slider.maximum() == 0:
+            return
         total_duration = self.time_to_seconds(self.audio_length_label.text())
         new_position = (value / self.seek_slider.maximum()) * total_duration
         pygame.mixer.music.stop()
@@ -590,6 +1095,27 @@ class AudioPlayer(QMainWindow):
             self.change_volume(int(value))
             self.volume_slider.valueChanged.connect(self.change_volume)  # Reconnect
 
+    def run_in_background(self, fn, *args, priority=PRIORITY_BACKGROUND, group=None, on_result=None, **kwargs):
+        # Jobs run on the scheduler's workers; results are handed back to the Qt thread through a signal.
+        return self.scheduler.submit(fn, *args, priority=priority, group=group,
+                                     callback=lambda job: self.background_job_finished.emit(job, on_result), **kwargs)
+
+    def handle_background_job_result(self, job, on_result):
+        if job.error is not None:
+            self.log(f"Background job {getattr(job.fn, '__name__', job.fn)} failed: {job.error}", error=True)
+        elif on_result is not None:
+            on_result(job.result)
+
+    def show_background_job_stats(self):
+        lines = [f"{self.scheduler.queue_depth()} jobs queued"]
+        for lane, stats in self.scheduler.stats().items():
+            lines.append(f"{lane}: {stats['queue_depth']} queued, {stats['running']} running, "
+                         f"{stats['completed']} done, {stats['failed']} failed, {stats['cancelled']} cancelled, "
+                         f"avg wait {stats['avg_wait_ms']:.1f} ms, avg run {stats['avg_run_ms']:.1f} ms")
+        cache = self.directory_cache
+        lines.append(f"directory cache: {len(cache)} folders, {cache.hits} hits, {cache.misses} misses")
+        QMessageBox.information(self, "Background Jobs", "\n".join(lines))
+
     def log(self, message, error=False):
         current_time = datetime.datetime.now().strftime('%H:%M:%S')
         error_tag = "ERROR" if error else "INFO"
@@ -600,17 +1126,47 @@ class AudioPlayer(QMainWindow):
 
     def get_file_browser_item_path(self, item):
         current_path = self.folder_path_field.text()
-        file_name = item.text(0)
-        return os.path.join(current_path, file_name) + (item.text(1) if item.text(1) != "Folder" else "")
+        names = [item.text(0)]
+        parent = item.parent()
+        while parent is not None:
+            names.insert(0, parent.text(0))
+            parent = parent.parent()
+        return os.path.join(current_path, *names) + (item.text(1) if item.text(1) != "Folder" else "")
 
     def get_active_audio_index(self):
-        for i in range(self.file_browser.topLevelItemCount()):
-            item = self.file_browser.topLevelItem(i)
-            if item.text(0) == self.active_audio_name_label.text():
-                self.log(f"Active audio index: {i}")
-                return i
+        return self.get_active_audio_position()[1]
+
+    def get_active_audio_position(self):
+        # Returns the parent item (None at the top level) and the row of the playing file within it,
+        # walking down expanded folders when the file lives below the shown directory.
+        names = [self.active_audio_name_label.text()]
+        if self.active_audio_path is not None:
+            try:
+                relative_path = os.path.relpath(self.active_audio_path, self.folder_path_field.text())
+            except ValueError:
+                relative_path = os.pardir
+            if not relative_path.startswith(os.pardir):
+                names = relative_path.split(os.sep)
+        parent = None
+        for depth, name in enumerate(names):
+            index = next((i for i in range(self.get_browser_item_count(parent))
+                          if self.get_browser_item(parent, i).text(0) == name), -1)
+            if index == -1:
+                break
+            if depth == len(names) - 1:
+                self.log(f"Active audio index: {index}")
+                return parent, index
+            parent = self.get_browser_item(parent, index)
         self.log("Index for active audio not found.")
-        return -1
+        return None, -1
+
+    def get_browser_item_count(self, parent):
+        return parent.childCount() if parent is not None else self.file_browser.topLevelItemCount()
+
+    def get_browser_item(self, parent, index):
+        if index < 0:
+            return None
+        return parent.child(index) if parent is not None else self.file_browser.topLevelItem(index)
 
     def time_to_seconds(self, time):
         minutes, seconds = map(int, time.split(":"))
@@ -682,6 +1238,12 @@ class AudioPlayer(QMainWindow):
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
+    instance_server = InstanceServer()
+    if not instance_server.listen(sys.argv[1:]):
+        sys.exit(0)
     window = AudioPlayer()
+    instance_server.command_received.connect(window.handle_remote_command)
     window.show()
+    if sys.argv[1:]:
+        window.handle_remote_command(*parse_arguments(sys.argv[1:]))
     sys.exit(app.exec_())
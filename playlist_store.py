@@ -0,0 +1,215 @@
+import os
+import sqlite3
+import threading
+from urllib.parse import unquote, urlparse
+
+# Entries are ordered by a sparse integer sort key, so appends and moves touch a single row.
+# Only when two neighbours run out of room between their keys is the tail of the playlist shifted.
+SORT_KEY_GAP = 1024
+APPEND_BATCH_SIZE = 1000
+EXPORT_BATCH_SIZE = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS playlists (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    entry_count INTEGER NOT NULL DEFAULT 0,
+    cursor_entry_id INTEGER
+);
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    playlist_id INTEGER NOT NULL REFERENCES playlists(id) ON DELETE CASCADE,
+    sort_key INTEGER NOT NULL,
+    path TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_order ON entries(playlist_id, sort_key, id);
+"""
+
+
+class PlaylistError(Exception):
+    pass
+
+
+class PlaylistStore:
+    def __init__(self, db_path):
+        self.db_path = str(db_path)
+        self._local = threading.local()
+        with self._connection() as connection:
+            connection.executescript(SCHEMA)
+
+    def _connection(self):
+        # One connection per thread, so imports can run on the background scheduler.
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA foreign_keys=ON")
+            self._local.connection = connection
+        return connection
+
+    def close(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    # --- Playlists ---
+
+    def list_playlists(self):
+        return self._connection().execute(
+            "SELECT id, name, entry_count FROM playlists ORDER BY name COLLATE NOCASE").fetchall()
+
+    def create_playlist(self, name):
+        try:
+            with self._connection() as connection:
+                return connection.execute("INSERT INTO playlists (name) VALUES (?)", (name,)).lastrowid
+        except sqlite3.IntegrityError:
+            raise PlaylistError(f"A playlist named '{name}' already exists.")
+
+    def find_playlist(self, name):
+        row = self._connection().execute("SELECT id FROM playlists WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def playlist_name(self, playlist_id):
+        row = self._connection().execute("SELECT name FROM playlists WHERE id = ?", (playlist_id,)).fetchone()
+        if row is None:
+            raise PlaylistError(f"Playlist {playlist_id} does not exist.")
+        return row[0]
+
+    def delete_playlist(self, playlist_id):
+        with self._connection() as connection:
+            connection.execute("DELETE FROM playlists WHERE id = ?", (playlist_id,))
+
+    # --- Entries ---
+
+    def count(self, playlist_id):
+        row = self._connection().execute(
+            "SELECT entry_count FROM playlists WHERE id = ?", (playlist_id,)).fetchone()
+        return row[0] if row else 0
+
+    def entries(self, playlist_id, offset, limit):
+        return self._connection().execute(
+            "SELECT id, path FROM entries WHERE playlist_id = ? ORDER BY sort_key, id LIMIT ? OFFSET ?",
+            (playlist_id, limit, offset)).fetchall()
+
+    def entry_at(self, playlist_id, index):
+        rows = self.entries(playlist_id, index, 1)
+        return rows[0] if rows else None
+
+    def index_of_entry(self, playlist_id, entry_id):
+        connection = self._connection()
+        row = connection.execute("SELECT sort_key FROM entries WHERE id = ? AND playlist_id = ?",
+                                 (entry_id, playlist_id)).fetchone()
+        if row is None:
+            return -1
+        return connection.execute(
+            "SELECT COUNT(*) FROM entries WHERE playlist_id = ? AND (sort_key < ? OR (sort_key = ? AND id < ?))",
+            (playlist_id, row[0], row[0], entry_id)).fetchone()[0]
+
+    def append(self, playlist_id, paths):
+        # Accepts any iterable and writes it in batches, so huge imports never sit in memory at once.
+        connection = self._connection()
+        row = connection.execute("SELECT MAX(sort_key) FROM entries WHERE playlist_id = ?",
+                                 (playlist_id,)).fetchone()
+        next_key = (row[0] or 0) + SORT_KEY_GAP
+        added = 0
+        batch = []
+        for path in paths:
+            batch.append((playlist_id, next_key, path))
+            next_key += SORT_KEY_GAP
+            if len(batch) >= APPEND_BATCH_SIZE:
+                self._insert_batch(connection, playlist_id, batch)
+                added += len(batch)
+                batch = []
+        if batch:
+            self._insert_batch(connection, playlist_id, batch)
+            added += len(batch)
+        return added
+
+    def _insert_batch(self, connection, playlist_id, batch):
+        with connection:
+            connection.executemany("INSERT INTO entries (playlist_id, sort_key, path) VALUES (?, ?, ?)", batch)
+            connection.execute("UPDATE playlists SET entry_count = entry_count + ? WHERE id = ?",
+                               (len(batch), playlist_id))
+
+    def remove(self, playlist_id, index):
+        entry = self.entry_at(playlist_id, index)
+        if entry is None:
+            raise PlaylistError(f"No entry at position {index}.")
+        with self._connection() as connection:
+            connection.execute("DELETE FROM entries WHERE id = ?", (entry[0],))
+            connection.execute("UPDATE playlists SET entry_count = entry_count - 1 WHERE id = ?", (playlist_id,))
+
+    def move(self, playlist_id, from_index, to_index):
+        # Moves the entry at from_index so that it ends up at to_index, rewriting only its sort key.
+        to_index = max(0, min(to_index, self.count(playlist_id) - 1))
+        if from_index == to_index:
+            return
+        entry = self.entry_at(playlist_id, from_index)
+        if entry is None:
+            raise PlaylistError(f"No entry at position {from_index}.")
+        connection = self._connection()
+        # Neighbours at the destination, looked up as if the moved entry were already removed.
+        before = self._sort_key_at(connection, playlist_id, to_index - 1, entry[0]) if to_index > 0 else None
+        after = self._sort_key_at(connection, playlist_id, to_index, entry[0])
+        with connection:
+            if before is None:
+                new_key = after - SORT_KEY_GAP
+            elif after is None:
+                new_key = before + SORT_KEY_GAP
+            else:
+                if after - before < 2:
+                    connection.execute(
+                        "UPDATE entries SET sort_key = sort_key + ? WHERE playlist_id = ? AND sort_key > ? AND id != ?",
+                        (SORT_KEY_GAP * 2, playlist_id, before, entry[0]))
+                    after += SORT_KEY_GAP * 2
+                new_key = (before + after) // 2
+            connection.execute("UPDATE entries SET sort_key = ? WHERE id = ?", (new_key, entry[0]))
+
+    def _sort_key_at(self, connection, playlist_id, index, excluded_entry_id):
+        row = connection.execute(
+            "SELECT sort_key FROM entries WHERE playlist_id = ? AND id != ? ORDER BY sort_key, id LIMIT 1 OFFSET ?",
+            (playlist_id, excluded_entry_id, index)).fetchone()
+        return row[0] if row else None
+
+    def set_cursor(self, playlist_id, entry_id):
+        with self._connection() as connection:
+            connection.execute("UPDATE playlists SET cursor_entry_id = ? WHERE id = ?", (entry_id, playlist_id))
+
+    def cursor_index(self, playlist_id):
+        row = self._connection().execute(
+            "SELECT cursor_entry_id FROM playlists WHERE id = ?", (playlist_id,)).fetchone()
+        if row is None or row[0] is None:
+            return -1
+        return self.index_of_entry(playlist_id, row[0])
+
+    # --- M3U import / export ---
+
+    def import_m3u(self, m3u_path, name=None):
+        name = name or os.path.splitext(os.path.basename(m3u_path))[0]
+        playlist_id = self.create_playlist(name)
+        base_dir = os.path.dirname(os.path.abspath(m3u_path))
+        with open(m3u_path, 'r', encoding='utf-8-sig', errors='replace') as f:
+            self.append(playlist_id, (path for path in (self._m3u_entry_path(line, base_dir) for line in f) if path))
+        return playlist_id
+
+    def _m3u_entry_path(self, line, base_dir):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            return None
+        if line.startswith('file://'):
+            return unquote(urlparse(line).path)
+        if '://' in line:
+            return line
+        return os.path.normpath(os.path.join(base_dir, line))
+
+    def export_m3u(self, playlist_id, m3u_path):
+        with open(m3u_path, 'w', encoding='utf-8') as f:
+            f.write("#EXTM3U\n")
+            cursor = self._connection().execute(
+                "SELECT path FROM entries WHERE playlist_id = ? ORDER BY sort_key, id", (playlist_id,))
+            while True:
+                rows = cursor.fetchmany(EXPORT_BATCH_SIZE)
+                if not rows:
+                    break
+                f.writelines(f"{row[0]}\n" for row in rows)
@@ -0,0 +1,213 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+PRIORITY_PLAYING = 0
+PRIORITY_VISIBLE = 1
+PRIORITY_BACKGROUND = 2
+PRIORITY_NAMES = {PRIORITY_PLAYING: "playing", PRIORITY_VISIBLE: "visible", PRIORITY_BACKGROUND: "background"}
+
+BACKEND_THREAD = "thread"
+BACKEND_PROCESS = "process"
+
+# While throttled (audio is playing) background jobs run one at a time with a pause in between,
+# so library indexing never competes with the mixer for CPU.
+THROTTLED_BACKGROUND_WORKERS = 1
+THROTTLED_BACKGROUND_DELAY = 0.05
+
+
+class Job:
+    def __init__(self, fn, args, kwargs, priority, group, callback):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.group = group
+        self.callback = callback
+        self.result = None
+        self.error = None
+        self.cancelled = False
+        self.submitted_at = time.perf_counter()
+        self.started_at = None
+        self.finished_at = None
+        self._done = threading.Event()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def _cancel(self):
+        # Only jobs that have not started yet can be cancelled; callers hold the scheduler's lock.
+        if self.started_at is None and not self.cancelled:
+            self.cancelled = True
+            self._done.set()
+        return self.cancelled
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+
+class LaneStats:
+    def __init__(self):
+        self.pending = 0
+        self.running = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_run = 0.0
+
+    def as_dict(self):
+        finished = self.completed + self.failed
+        return {
+            'queue_depth': self.pending,
+            'running': self.running,
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'failed': self.failed,
+            'cancelled': self.cancelled,
+            'avg_wait_ms': (self.total_wait / finished * 1000) if finished else 0.0,
+            'max_wait_ms': self.max_wait * 1000,
+            'avg_run_ms': (self.total_run / finished * 1000) if finished else 0.0,
+        }
+
+
+class JobScheduler:
+    def __init__(self, max_workers=None, backend=BACKEND_THREAD):
+        if backend not in (BACKEND_THREAD, BACKEND_PROCESS):
+            raise ValueError(f"Unknown scheduler backend: {backend}")
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.backend = backend
+        self.throttled = False
+        self._queue = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._stats = {priority: LaneStats() for priority in PRIORITY_NAMES}
+        self._last_background_finish = 0.0
+        self._shutting_down = False
+        self._process_pool = ProcessPoolExecutor(self.max_workers) if backend == BACKEND_PROCESS else None
+        self._workers = [threading.Thread(target=self._worker, daemon=True, name=f"JobScheduler-{i}")
+                         for i in range(self.max_workers)]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, fn, *args, priority=PRIORITY_BACKGROUND, group=None, callback=None, **kwargs):
+        if priority not in PRIORITY_NAMES:
+            raise ValueError(f"Unknown job priority: {priority}")
+        job = Job(fn, args, kwargs, priority, group, callback)
+        with self._condition:
+            if self._shutting_down:
+                raise RuntimeError("Cannot submit jobs after shutdown")
+            heapq.heappush(self._queue, (priority, next(self._sequence), job))
+            self._stats[priority].submitted += 1
+            self._condition.notify()
+        return job
+
+    def cancel(self, job):
+        with self._condition:
+            return job._cancel()
+
+    def cancel_group(self, group):
+        # Drops every pending job of the group, e.g. prefetches for a folder the user navigated away from.
+        cancelled = 0
+        with self._condition:
+            for _, _, job in self._queue:
+                if job.group == group and not job.cancelled and job._cancel():
+                    cancelled += 1
+        return cancelled
+
+    def set_throttled(self, throttled):
+        with self._condition:
+            self.throttled = throttled
+            self._condition.notify_all()
+
+    def stats(self):
+        with self._condition:
+            for lane in self._stats.values():
+                lane.pending = 0
+            for _, _, job in self._queue:
+                if not job.cancelled:
+                    self._stats[job.priority].pending += 1
+            return {PRIORITY_NAMES[priority]: lane.as_dict() for priority, lane in self._stats.items()}
+
+    def queue_depth(self):
+        with self._condition:
+            return sum(1 for _, _, job in self._queue if not job.cancelled)
+
+    def shutdown(self, wait=False):
+        with self._condition:
+            self._shutting_down = True
+            for _, _, job in self._queue:
+                job._cancel()
+            self._condition.notify_all()
+        if wait:
+            for worker in self._workers:
+                worker.join()
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=wait, cancel_futures=True)
+
+    def _next_job(self):
+        with self._condition:
+            while True:
+                while self._queue and self._queue[0][2].cancelled:
+                    _, _, job = heapq.heappop(self._queue)
+                    self._stats[job.priority].cancelled += 1
+                if self._shutting_down:
+                    return None
+                if self._queue:
+                    job = self._queue[0][2]
+                    delay = self._throttle_delay(job)
+                    if delay <= 0:
+                        heapq.heappop(self._queue)
+                        self._stats[job.priority].running += 1
+                        job.started_at = time.perf_counter()
+                        return job
+                    self._condition.wait(delay)
+                else:
+                    self._condition.wait()
+
+    def _throttle_delay(self, job):
+        if not self.throttled or job.priority != PRIORITY_BACKGROUND:
+            return 0
+        if self._stats[PRIORITY_BACKGROUND].running >= THROTTLED_BACKGROUND_WORKERS:
+            return THROTTLED_BACKGROUND_DELAY
+        return self._last_background_finish + THROTTLED_BACKGROUND_DELAY - time.perf_counter()
+
+    def _worker(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            try:
+                if self._process_pool is not None:
+                    job.result = self._process_pool.submit(job.fn, *job.args, **job.kwargs).result()
+                else:
+                    job.result = job.fn(*job.args, **job.kwargs)
+            except Exception as e:
+                job.error = e
+            job.finished_at = time.perf_counter()
+            with self._condition:
+                lane = self._stats[job.priority]
+                lane.running -= 1
+                if job.error is None:
+                    lane.completed += 1
+                else:
+                    lane.failed += 1
+                wait = job.started_at - job.submitted_at
+                lane.total_wait += wait
+                lane.max_wait = max(lane.max_wait, wait)
+                lane.total_run += job.finished_at - job.started_at
+                if job.priority == PRIORITY_BACKGROUND:
+                    self._last_background_finish = job.finished_at
+                self._condition.notify_all()
+            job._done.set()
+            if job.callback is not None:
+                try:
+                    job.callback(job)
+                except Exception as e:
+                    print(f"Job callback failed: {e}")
@@ -0,0 +1,76 @@
+import getpass
+import json
+import os
+from PyQt5.QtCore import QObject, pyqtSignal
+from PyQt5.QtNetwork import QAbstractSocket, QLocalServer, QLocalSocket
+
+# Kept free of pygame/pylast imports so a second launch can hand its arguments to the
+# running player and exit without paying the full application startup cost.
+
+SERVER_NAME = f"musicapp-{getpass.getuser()}"
+CONNECT_TIMEOUT_MS = 200
+PLAYBACK_COMMANDS = {'play', 'pause', 'toggle', 'next', 'previous', 'show'}
+PATH_COMMANDS = {'open', 'enqueue'}
+
+
+def parse_arguments(args):
+    if not args:
+        return 'show', []
+    command = args[0].lower()
+    if command in PLAYBACK_COMMANDS:
+        return command, []
+    if command in PATH_COMMANDS:
+        return command, [os.path.abspath(path) for path in args[1:]]
+    return 'open', [os.path.abspath(path) for path in args]
+
+
+def send_to_running_instance(args):
+    socket = QLocalSocket()
+    socket.connectToServer(SERVER_NAME)
+    if not socket.waitForConnected(CONNECT_TIMEOUT_MS):
+        return False
+    command, paths = parse_arguments(args)
+    socket.write(json.dumps({'command': command, 'paths': paths}).encode('utf-8') + b"\n")
+    socket.waitForBytesWritten(CONNECT_TIMEOUT_MS)
+    socket.disconnectFromServer()
+    return True
+
+
+class InstanceServer(QObject):
+    command_received = pyqtSignal(str, list)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.server = QLocalServer(self)
+        self.server.newConnection.connect(self.accept_connections)
+
+    def listen(self, args):
+        # Returns False when another player claimed the name first and the arguments were handed to it.
+        self.server.setSocketOptions(QLocalServer.UserAccessOption)
+        if self.server.listen(SERVER_NAME):
+            return True
+        if self.server.serverError() == QAbstractSocket.AddressInUseError:
+            # Another launch may have started listening since our first connect attempt.
+            if send_to_running_instance(args):
+                return False
+            # Nobody answers on the name, so it is a stale socket left by a crash.
+            QLocalServer.removeServer(SERVER_NAME)
+            if self.server.listen(SERVER_NAME):
+                return True
+        print(f"Single-instance server unavailable: {self.server.errorString()}")
+        return True
+
+    def accept_connections(self):
+        while self.server.hasPendingConnections():
+            socket = self.server.nextPendingConnection()
+            socket.readyRead.connect(lambda socket=socket: self.read_commands(socket))
+            socket.disconnected.connect(socket.deleteLater)
+
+    def read_commands(self, socket):
+        while socket.canReadLine():
+            line = bytes(socket.readLine()).decode('utf-8').strip()
+            try:
+                message = json.loads(line)
+                self.command_received.emit(message['command'], list(message.get('paths', [])))
+            except (ValueError, KeyError) as e:
+                print(f"Ignoring malformed instance command {line!r}: {e}")